@@ -0,0 +1,105 @@
+"""
+Record/replay for LLM and MCP traffic.
+
+Set `SHHELP_RECORD=<path>` to append every `litellm.acompletion` and MCP `list_tools`/`call_tool` exchange to a JSON-lines cassette. Set `SHHELP_REPLAY=<path>` to serve those exchanges back, in order, without touching the network or starting any MCP servers. `SHHELP_REPLAY_LATENCY` scales the recorded latency during replay: 0 (default) replays instantly, 1 replays in real time.
+"""
+
+import asyncio
+import collections
+import collections.abc
+import json
+import os
+import pathlib
+import time
+import typing
+
+import beartype
+
+T = typing.TypeVar("T")
+
+
+@beartype.beartype
+class Cassette:
+    def __init__(self, path: pathlib.Path, *, replay: bool, latency_scale: float = 0.0):
+        self.path = path
+        self.replay = replay
+        self.latency_scale = latency_scale
+        self._queues: dict[str, collections.deque] = collections.defaultdict(
+            collections.deque
+        )
+
+        if replay:
+            with path.open() as fd:
+                for line in fd:
+                    if not line.strip():
+                        continue
+                    entry = json.loads(line)
+                    self._queues[entry["kind"]].append(entry)
+        else:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            path.write_text("")
+
+    async def call(
+        self,
+        kind: str,
+        key: str,
+        fn: collections.abc.Callable[[], collections.abc.Awaitable[T]],
+        *,
+        dump: collections.abc.Callable[[T], object],
+        load: collections.abc.Callable[[object], T],
+        request: object = None,
+    ) -> T:
+        """Run `fn` (recording its result) or serve the next recorded `kind` exchange.
+
+        Args:
+            kind: Type of exchange, e.g. "completion" or "call_tool".
+            key: Short identifier that must match on replay (model or tool name).
+            fn: Performs the real request.
+            dump: Converts the response to JSON-compatible data.
+            load: Inverse of `dump`.
+            request: Full request, stored for debugging only.
+        """
+        if self.replay:
+            queue = self._queues[kind]
+            if not queue:
+                raise RuntimeError(
+                    f"Cassette {self.path} has no more '{kind}' exchanges for '{key}'."
+                )
+            entry = queue.popleft()
+            if entry["key"] != key:
+                raise RuntimeError(
+                    f"Cassette {self.path} expected '{kind}' for '{entry['key']}', got '{key}'."
+                )
+            if self.latency_scale > 0:
+                await asyncio.sleep(entry["elapsed"] * self.latency_scale)
+            return load(entry["response"])
+
+        start = time.perf_counter()
+        resp = await fn()
+        elapsed = time.perf_counter() - start
+        entry = {
+            "kind": kind,
+            "key": key,
+            "elapsed": elapsed,
+            "request": request,
+            "response": dump(resp),
+        }
+        with self.path.open("a") as fd:
+            fd.write(json.dumps(entry, default=str) + "\n")
+        return resp
+
+
+@beartype.beartype
+def from_env() -> Cassette | None:
+    """Build a cassette from `SHHELP_RECORD`/`SHHELP_REPLAY`, or None if neither is set."""
+    record, replay = os.getenv("SHHELP_RECORD"), os.getenv("SHHELP_REPLAY")
+    if record and replay:
+        raise ValueError("Set at most one of SHHELP_RECORD and SHHELP_REPLAY.")
+    if replay:
+        latency_scale = float(os.getenv("SHHELP_REPLAY_LATENCY", "0"))
+        return Cassette(
+            pathlib.Path(replay).expanduser(), replay=True, latency_scale=latency_scale
+        )
+    if record:
+        return Cassette(pathlib.Path(record).expanduser(), replay=False)
+    return None
@@ -8,7 +8,21 @@ import beartype
 import mcp
 import tyro
 
-from . import config, llms, templating, tmux, ui
+from . import cassette, config, hooks, ranking, snapshot, templating, tmux, ui
+
+
+@beartype.beartype
+def _supports_function_calling(model: str) -> bool:
+    import litellm
+
+    return litellm.supports_function_calling(model)
+
+
+def _import_llms():
+    # llms imports litellm at module level, which takes a while.
+    from . import llms
+
+    return llms
 
 
 @beartype.beartype
@@ -17,47 +31,105 @@ async def cli(
     /,
     cfg: typing.Annotated[config.Config, tyro.conf.arg(name="")] = config.Config(),
     context: bool = True,
+    pager: bool = False,
+    continue_: typing.Annotated[bool, tyro.conf.arg(name="continue")] = False,
+    all_panes: bool = False,
 ) -> int:
     """
     Ask an LLM for help with shell commands.
 
+    `shh init zsh|bash|fish` (exactly those two words) prints the shell hook snippet instead of asking a question; quote it, as in `shh "init bash"`, to send those words to the model.
+
     Args:
         words: Your query.
         context: Whether to include any of your current shell context in your query.
+        pager: Whether to show full tool output in a pager instead of truncating it.
+        continue_: Ask a follow-up to the last conversation in this terminal instead of starting a new one.
+        all_panes: Consider panes in every tmux session and include only the ones most relevant to your query.
     """
     cfg = config.load(cfg)
 
-    import litellm
+    query = " ".join(words)
+    cas = cassette.from_env()
 
-    if not litellm.supports_function_calling(cfg.model):
-        print(f"Error: The model '{cfg.model}' does not support function calling.")
-        print("Please choose a different model that supports this feature.")
-        return 1
+    snap = None
+    if continue_:
+        snap = snapshot.load(snapshot.fingerprint())
+        if snap is None:
+            print("No previous conversation in this terminal; starting a new one.")
 
-    query = " ".join(words)
+    # None of the startup steps depend on each other until the first request, so blocking work (imports, tmux captures, the alias shell) runs in worker threads while the MCP servers come up on the event loop.
+    supported_task = asyncio.create_task(
+        asyncio.to_thread(_supports_function_calling, cfg.model)
+    )
+    llms_task = asyncio.create_task(asyncio.to_thread(_import_llms))
+    pending = [llms_task]
+    if snap is None:
+        template_task = asyncio.create_task(
+            asyncio.to_thread(templating.load, "prompt.j2")
+        )
+        ctx_task = asyncio.create_task(
+            asyncio.to_thread(
+                tmux.Context,
+                n_commands=cfg.recent_commands,
+                history_lines=cfg.history_lines,
+                all_panes=all_panes,
+            )
+        )
+        pending += [template_task, ctx_task]
 
     async with contextlib.AsyncExitStack() as stack:
-        manager = McpServerManager()
+        # MCP sessions must be entered (and later exited) from this task, so they are not wrapped in a separate task.
+        manager = McpServerManager(cassette=cas)
         await manager.initialize(stack, cfg.mcp_servers)
+        if snap is None:
+            all_tools = await manager.list_tools()
+            tools = manager.select_tools(query, k=cfg.max_tools)
+        else:
+            all_tools, tools = snap.all_tools, snap.tools
+            # Tools aren't re-listed, so restore which server owns each one.
+            manager.tools_map = {
+                name: tuple(target) for name, target in snap.tool_servers.items()
+            }
 
-        conversation = llms.Conversation(model=cfg.model, api_key=cfg.api_key)
+        # Join everything before the first request.
+        if not await supported_task:
+            for task in pending:
+                task.cancel()
+            print(f"Error: The model '{cfg.model}' does not support function calling.")
+            print("Please choose a different model that supports this feature.")
+            return 1
 
-        template = templating.load("prompt.j2")
-        ctx = tmux.Context()
+        llms = await llms_task
 
-        system = template.render(
-            active_pane=ctx.active,
-            panes=ctx.panes,
-            system=ctx.system,
-            shell=ctx.shell,
-            aliases=ctx.aliases,
-            context=context,
-        )
+        if snap is None:
+            template = await template_task
+            ctx = await ctx_task
 
-        conversation.system(system)
-        conversation.user(query)
+            panes = ctx.panes
+            if all_panes:
+                panes = tmux.top_panes(query, list(panes), k=cfg.max_panes)
+
+            conversation = llms.Conversation(
+                model=cfg.model, api_key=cfg.api_key, cassette=cas
+            )
+
+            system = template.render(
+                active_pane=ctx.active,
+                panes=panes,
+                system=ctx.system,
+                shell=ctx.shell,
+                aliases=ctx.aliases,
+                commands=ctx.commands,
+                context=context,
+            )
+            conversation.system(system)
+        else:
+            conversation = llms.Conversation.from_snapshot(
+                snap, model=cfg.model, api_key=cfg.api_key, cassette=cas
+            )
 
-        tools = await manager.list_tools()
+        conversation.user(query)
 
         while True:
             toks, usd = conversation.get_costs()
@@ -76,13 +148,23 @@ async def cli(
             deny_notes = []
             for tc in msg.tool_calls:
                 try:
+                    if tc.function.name == CATALOG_TOOL["name"]:
+                        tools = all_tools
+                        names = ", ".join(t["name"] for t in tools)
+                        conversation.tool(
+                            f"All tools are now available: {names}", tool_call_id=tc.id
+                        )
+                        continue
+
                     kwargs = json.loads(tc.function.arguments)
                     if ui.confirm(
                         f"Run tool [cmd]{tc.function.name}[/cmd] with args [cmd]{kwargs}[/cmd]? [Y/n]:"
                     ):
                         result = await manager.call_tool(tc.function.name, kwargs)
                         for content in result.content:
-                            ui.echo(content.text)
+                            ui.echo_output(
+                                content.text, lines=cfg.tool_output_lines, pager=pager
+                            )
                             conversation.tool(content.text, tool_call_id=tc.id)
                     else:
                         note = ui.ask_tool_skip_reason(tc.function.name)
@@ -95,6 +177,17 @@ async def cli(
             if deny_notes:
                 conversation.user("\n".join(deny_notes))
 
+        snapshot.save(
+            conversation.to_snapshot(
+                tools=tools,
+                all_tools=all_tools,
+                tool_servers={
+                    name: list(target) for name, target in manager.tools_map.items()
+                },
+                fingerprint=snapshot.fingerprint(),
+            )
+        )
+
     return 0
 
 
@@ -106,13 +199,28 @@ class McpSession(typing.Protocol):
     async def call_tool(self, name: str, arguments: dict[str, object]): ...
 
 
+# Offered alongside a subset of tools so the model can ask for the rest.
+CATALOG_TOOL = {
+    "name": "shhelp_list_all_tools",
+    "description": "Only the tools most relevant to the user's question are available. Call this to make every tool available and list their names.",
+    "input_schema": {"type": "object", "properties": {}},
+}
+
+
 @beartype.beartype
 class McpServerManager:
-    def __init__(self):
+    def __init__(self, cassette: cassette.Cassette | None = None):
         self.sessions = {}
-        self.tools_map = {}  # Maps prefixed tool names to (session, original_name)
+        self.tools_map = {}  # Maps prefixed tool names to (server_name, original_name)
+        self.cassette = cassette
+        self.tools = []
+        self._index = ranking.Bm25([])
 
     async def initialize(self, stack, servers: list[config.McpServer]):
+        if self.cassette is not None and self.cassette.replay:
+            # Replayed exchanges don't need live servers.
+            return
+
         for server in servers:
             stdio = await stack.enter_async_context(
                 mcp.client.stdio.stdio_client(
@@ -124,6 +232,42 @@ class McpServerManager:
             self.sessions[server.name] = session
 
     async def list_tools(self):
+        if self.cassette is None:
+            tools = await self._list_tools()
+        else:
+            tools = await self.cassette.call(
+                "list_tools", "", self._list_tools, dump=lambda t: t, load=lambda t: t
+            )
+
+        self.tools = tools
+        self._index = ranking.Bm25([
+            ranking.tokenize(f"{t['name']} {t['description'] or ''}") for t in tools
+        ])
+        return tools
+
+    def select_tools(self, query: str, *, k: int):
+        """Return the `k` tools most relevant to `query` plus `CATALOG_TOOL`, or every tool if there are at most `k` (or `k` is 0)."""
+        if k <= 0 or len(self.tools) <= k:
+            return list(self.tools)
+        scores = self._index.scores(ranking.tokenize(query))
+        return [self.tools[i] for i in ranking.top_k(scores, k)] + [CATALOG_TOOL]
+
+    async def call_tool(self, prefixed_name, arguments):
+        async def request():
+            return await self._call_tool(prefixed_name, arguments)
+
+        if self.cassette is None:
+            return await request()
+        return await self.cassette.call(
+            "call_tool",
+            prefixed_name,
+            request,
+            dump=lambda r: r.model_dump(mode="json"),
+            load=mcp.types.CallToolResult.model_validate,
+            request=arguments,
+        )
+
+    async def _list_tools(self):
         all_tools = []
         for server_name, session in self.sessions.items():
             response = await session.list_tools()
@@ -134,15 +278,23 @@ class McpServerManager:
                     "description": tool.description,
                     "input_schema": tool.inputSchema,
                 })
-                self.tools_map[prefixed_name] = (session, tool.name)
+                self.tools_map[prefixed_name] = (server_name, tool.name)
         return all_tools
 
-    async def call_tool(self, prefixed_name, arguments):
+    async def _call_tool(self, prefixed_name, arguments):
         if prefixed_name not in self.tools_map:
             raise ValueError(f"Unknown tool: {prefixed_name}")
-        session, original_name = self.tools_map[prefixed_name]
-        return await session.call_tool(original_name, arguments)
+        server_name, original_name = self.tools_map[prefixed_name]
+        if server_name not in self.sessions:
+            raise ValueError(
+                f"Server '{server_name}' for tool {prefixed_name} is not running"
+            )
+        return await self.sessions[server_name].call_tool(original_name, arguments)
 
 
 def main():
+    # `shh init <shell>` prints the shell hook snippet; anything else is a query.
+    if len(sys.argv) == 3 and sys.argv[1] == "init" and sys.argv[2] in hooks.SHELLS:
+        print(hooks.init(sys.argv[2]), end="")
+        sys.exit(0)
     sys.exit(asyncio.run(tyro.cli(cli)))
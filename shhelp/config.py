@@ -33,12 +33,20 @@ class Config:
         api_key: Secret for your LLM backend (OpenAI / Anthropic / etc.). Default None, which falls back to env var `SHHELP_API_KEY` or backend-specific vars like `OPENAI_API_KEY`.
         model: Identifier sent to the provider, e.g. ``gpt-4o-mini``.
         history_lines: How many lines of tmux scrollback to include in the prompt.
+        max_panes: With `--all-panes`, how many of the most relevant other panes to include in the prompt.
+        recent_commands: How many recent commands recorded by the shell hooks (`shh init`) to include in the prompt.
+        tool_output_lines: How many lines to show from the start and end of each tool output.
+        max_tools: How many MCP tools, ranked by relevance to the query, to offer the model up front; 0 offers every tool.
         mcp_servers: Server configuration.
     """
 
     api_key: str = ""
     model: str = "gpt-4.1-mini"
     history_lines: int = 200  # reasonable default
+    max_panes: int = 3
+    recent_commands: int = 20
+    tool_output_lines: int = 40
+    max_tools: int = 16
     mcp_servers: list[McpServer] = dataclasses.field(default_factory=list)
 
 
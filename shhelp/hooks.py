@@ -0,0 +1,260 @@
+"""
+Shell integration that records every command into a fixed-size ring buffer.
+
+`shh init zsh|bash|fish` prints a snippet that installs preexec/precmd hooks. After each command the hook runs `python -m shhelp.hooks record ...` in the background, which appends the command, cwd, exit code and duration to a memory-mapped file in the state dir. `read_recent` then gives `tmux.Context` structured history without spawning any subprocesses, inside or outside tmux.
+
+File layout (little-endian):
+
+    header: magic (4s), slot size (I), slot count (I), records written (Q), padded to _HEADER_SIZE
+    slot:   seq (Q), start (d), duration (d), exit code (i), cwd len (H), cmd len (H), cwd + cmd bytes
+
+A slot's `seq` is written last and is `index + 1`, so readers can skip slots that are empty or were overwritten mid-read.
+"""
+
+import argparse
+import dataclasses
+import fcntl
+import mmap
+import pathlib
+import shlex
+import struct
+import sys
+import time
+
+import beartype
+
+from . import unix
+
+_MAGIC = b"SHH1"
+_HEADER = struct.Struct("<4sIIQ")
+_HEADER_SIZE = 64
+_SLOT = struct.Struct("<QddiHH")
+_SLOT_SIZE = 512
+_N_SLOTS = 1024
+
+SHELLS = ("zsh", "bash", "fish")
+
+
+@beartype.beartype
+@dataclasses.dataclass(frozen=True)
+class Command:
+    """A single command recorded by the shell hooks.
+
+    Attributes:
+        cmd: The command line, possibly truncated.
+        cwd: Working directory the command ran in.
+        exit_code: The command's exit status.
+        start: Unix timestamp when the command started.
+        duration: Wall-clock seconds the command took.
+    """
+
+    cmd: str
+    cwd: str
+    exit_code: int
+    start: float
+    duration: float
+
+
+@beartype.beartype
+def get_ring_path() -> pathlib.Path:
+    return unix.get_state_dir() / "commands.ring"
+
+
+@beartype.beartype
+def _encode(text: str, limit: int) -> bytes:
+    data = text.encode("utf-8", errors="replace")[:limit]
+    # Don't leave half a multi-byte character at the end.
+    return data.decode("utf-8", errors="ignore").encode("utf-8")
+
+
+@beartype.beartype
+def record(cmd: Command, path: pathlib.Path | None = None) -> None:
+    """Append `cmd` to the ring buffer at `path`, creating it if needed."""
+    path = path or get_ring_path()
+    size = _HEADER_SIZE + _SLOT_SIZE * _N_SLOTS
+
+    with open(path, "a+b") as fd:
+        fcntl.flock(fd, fcntl.LOCK_EX)
+        if fd.seek(0, 2) != size:
+            fd.truncate(size)
+        with mmap.mmap(fd.fileno(), size) as mm:
+            magic, slot_size, n_slots, count = _HEADER.unpack_from(mm, 0)
+            if (magic, slot_size, n_slots) != (_MAGIC, _SLOT_SIZE, _N_SLOTS):
+                mm[:] = bytes(size)
+                count = 0
+
+            room = _SLOT_SIZE - _SLOT.size
+            cwd = _encode(cmd.cwd, room // 4)
+            text = _encode(cmd.cmd, room - len(cwd))
+
+            offset = _HEADER_SIZE + (count % _N_SLOTS) * _SLOT_SIZE
+            _SLOT.pack_into(
+                mm,
+                offset,
+                0,
+                cmd.start,
+                cmd.duration,
+                cmd.exit_code,
+                len(cwd),
+                len(text),
+            )
+            body = offset + _SLOT.size
+            mm[body : body + len(cwd) + len(text)] = cwd + text
+            struct.pack_into("<Q", mm, offset, count + 1)
+            _HEADER.pack_into(mm, 0, _MAGIC, _SLOT_SIZE, _N_SLOTS, count + 1)
+
+
+@beartype.beartype
+def read_recent(n: int, path: pathlib.Path | None = None) -> tuple[Command, ...]:
+    """Return up to `n` most recently recorded commands, oldest first. Returns nothing if the hooks are not installed."""
+    path = path or get_ring_path()
+    try:
+        fd = open(path, "rb")
+    except FileNotFoundError:
+        return ()
+
+    with fd:
+        try:
+            mm = mmap.mmap(fd.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:  # empty file
+            return ()
+
+    with mm:
+        if len(mm) < _HEADER_SIZE:
+            return ()
+        magic, slot_size, n_slots, count = _HEADER.unpack_from(mm, 0)
+        if magic != _MAGIC or len(mm) < _HEADER_SIZE + slot_size * n_slots:
+            return ()
+
+        cmds = []
+        for i in range(count - 1, max(count - min(n, n_slots), 0) - 1, -1):
+            offset = _HEADER_SIZE + (i % n_slots) * slot_size
+            seq, start, duration, exit_code, cwd_len, cmd_len = _SLOT.unpack_from(
+                mm, offset
+            )
+            if seq != i + 1:
+                continue
+            body = offset + _SLOT.size
+            cwd = mm[body : body + cwd_len].decode("utf-8", errors="replace")
+            text = mm[body + cwd_len : body + cwd_len + cmd_len].decode(
+                "utf-8", errors="replace"
+            )
+            cmds.append(Command(text, cwd, exit_code, start, duration))
+
+    # Hooks record in the background, so quick commands can be written out of order.
+    return tuple(sorted(cmds, key=lambda c: c.start))
+
+
+_ZSH = """\
+zmodload zsh/datetime
+__shh_preexec() {{ __shh_cmd=$1; __shh_start=$EPOCHREALTIME; }}
+__shh_precmd() {{
+    local code=$?
+    [[ -z $__shh_cmd ]] && return
+    {record} --exit-code $code --start $__shh_start --end $EPOCHREALTIME --cwd "$PWD" -- "$__shh_cmd" &!
+    unset __shh_cmd
+}}
+autoload -Uz add-zsh-hook
+add-zsh-hook preexec __shh_preexec
+add-zsh-hook precmd __shh_precmd
+"""
+
+# Like bash-preexec: the DEBUG trap only starts the timer for the first simple command after the prompt, and that flag is only raised once the whole PROMPT_COMMAND (including other hooks) has run. The command line itself comes from `history 1`, so lists and pipelines are recorded whole; commands that never reached history (e.g. HISTCONTROL=ignorespace) repeat the previous history number and are skipped.
+# If bash-preexec is already loaded it owns the DEBUG trap and PROMPT_COMMAND, so the hooks register with it instead. Otherwise an existing DEBUG trap keeps running after ours, with $? and $_ restored for it.
+_BASH = """\
+__shh_at_prompt=0
+__shh_last_hist=
+__shh_set_ret() {{ return "$1"; }}
+__shh_start_timer() {{ __shh_start=$EPOCHREALTIME; }}
+__shh_preexec() {{
+    [[ $__shh_at_prompt == 1 && -z $COMP_LINE ]] || return
+    __shh_at_prompt=0
+    __shh_start_timer
+}}
+__shh_precmd() {{
+    local code=$? entry re='^ *([0-9]+)[*]? +(.*)$'
+    [[ -n $__shh_start ]] || return
+    entry=$(HISTTIMEFORMAT= builtin history 1)
+    if [[ $entry =~ $re && ${{BASH_REMATCH[1]}} != "$__shh_last_hist" ]]; then
+        __shh_last_hist=${{BASH_REMATCH[1]}}
+        ( {record} --exit-code $code --start $__shh_start --end $EPOCHREALTIME --cwd "$PWD" -- "${{BASH_REMATCH[2]}}" & )
+    fi
+    unset __shh_start
+}}
+__shh_prompt_done() {{ __shh_at_prompt=1; }}
+__shh_debug() {{
+    local ret=$? last=$1
+    __shh_preexec
+    [[ -n $__shh_prev_trap ]] || return 0
+    __shh_set_ret "$ret" "$last"
+    eval "$__shh_prev_trap"
+}}
+if [[ -n ${{__shh_installed-}} ]]; then
+    :
+elif [[ $(declare -p preexec_functions 2>/dev/null) == "declare -a"* ]]; then
+    __shh_installed=1
+    preexec_functions+=(__shh_start_timer)
+    precmd_functions+=(__shh_precmd)
+else
+    __shh_installed=1
+    __shh_prev_trap=$(trap -p DEBUG)
+    __shh_prev_trap=${{__shh_prev_trap#trap -- }}
+    eval "__shh_prev_trap=${{__shh_prev_trap% DEBUG}}"
+    trap '__shh_debug "$_"' DEBUG
+    if [[ $(declare -p PROMPT_COMMAND 2>/dev/null) == "declare -a"* ]]; then
+        PROMPT_COMMAND=(__shh_precmd "${{PROMPT_COMMAND[@]}}" __shh_prompt_done)
+    else
+        PROMPT_COMMAND="__shh_precmd${{PROMPT_COMMAND:+;$PROMPT_COMMAND}};__shh_prompt_done"
+    fi
+fi
+"""
+
+_FISH = """\
+function __shh_postexec --on-event fish_postexec
+    set -l code $status
+    {record} --exit-code $code --duration (math $CMD_DURATION / 1000) --cwd $PWD -- $argv[1] &
+    disown
+end
+"""
+
+
+@beartype.beartype
+def init(shell: str) -> str:
+    """Return the hook snippet for `shell`, meant to be eval'd from the shell's rc file."""
+    record_cmd = f"{shlex.quote(sys.executable)} -m shhelp.hooks record"
+    if shell == "zsh":
+        return _ZSH.format(record=record_cmd)
+    if shell == "bash":
+        return _BASH.format(record=record_cmd)
+    if shell == "fish":
+        return _FISH.format(record=record_cmd)
+    raise ValueError(f"Unsupported shell '{shell}'; expected one of {SHELLS}.")
+
+
+def _main(argv: list[str]) -> None:
+    # Runs after every shell command, so this sticks to argparse to keep startup cheap.
+    parser = argparse.ArgumentParser(prog="python -m shhelp.hooks")
+    sub = parser.add_subparsers(dest="action", required=True)
+    rec = sub.add_parser("record")
+    rec.add_argument("--exit-code", type=int, required=True)
+    rec.add_argument("--start", type=float)
+    rec.add_argument("--end", type=float)
+    rec.add_argument("--duration", type=float)
+    rec.add_argument("--cwd", required=True)
+    rec.add_argument("cmd")
+    args = parser.parse_args(argv)
+
+    # The recorder runs in the background, so prefer the shell's own end time.
+    now = args.end or time.time()
+    if args.start is not None:
+        start, duration = args.start, now - args.start
+    else:
+        duration = args.duration or 0.0
+        start = now - duration
+
+    cmd = Command(args.cmd, args.cwd, args.exit_code, start, duration)
+    record(cmd)
+
+
+if __name__ == "__main__":
+    _main(sys.argv[1:])
@@ -5,6 +5,8 @@ import pathlib
 import beartype
 import litellm
 
+from . import cassette, snapshot
+
 litellm.disable_aiohttp_transport = True
 
 _LOG_BASE = pathlib.Path(
@@ -35,13 +37,19 @@ class Conversation:
     _model: str
     _api_key: str
     _msgs: list[Message]
+    _toks: list[int]
     _logger: SessionLogger
+    _cassette: cassette.Cassette | None
 
-    def __init__(self, *, model: str, api_key: str):
+    def __init__(
+        self, *, model: str, api_key: str, cassette: cassette.Cassette | None = None
+    ):
         self._model = model
         self._api_key = api_key
         self._msgs = []
+        self._toks = []  # token count per message, filled lazily
         self._logger = SessionLogger()
+        self._cassette = cassette
 
     # Public API
     def system(self, content: str):
@@ -54,30 +62,79 @@ class Conversation:
         self._push({"role": "tool", "content": content, "tool_call_id": tool_call_id})
 
     async def send(self, *, tools: list[Tool] | None = None):
-        resp = await litellm.acompletion(
-            model=self._model,
-            messages=self._msgs,
-            tools=tools,
-            api_key=self._api_key,
-        )
+        async def request():
+            return await litellm.acompletion(
+                model=self._model,
+                messages=self._msgs,
+                tools=tools,
+                api_key=self._api_key,
+            )
+
+        if self._cassette is None:
+            resp = await request()
+        else:
+            resp = await self._cassette.call(
+                "completion",
+                self._model,
+                request,
+                dump=lambda r: r.model_dump(),
+                load=lambda d: litellm.ModelResponse(**d),
+                request={"messages": self._msgs, "tools": tools},
+            )
         msg = resp.choices[0].message
         self._push({
             "role": "assistant",
             "content": msg.content or "",
-            "tool_calls": msg.tool_calls,
+            "tool_calls": [tc.model_dump() for tc in msg.tool_calls]
+            if msg.tool_calls
+            else None,
         })
         return msg
 
     def get_costs(self) -> tuple[int, float]:
         usd_per_tok = litellm.model_cost[self._model]["input_cost_per_token"]
-        toks_per_msg = [
-            litellm.token_counter(model=self._model, messages=[m]) for m in self._msgs
-        ]
-        usd_per_msg = [usd_per_tok * toks for toks in toks_per_msg]
-        usd_total = sum(usd_per_msg)
-        toks_total = sum(toks_per_msg)
+        # Messages are append-only, so only new ones need tokenizing.
+        for m in self._msgs[len(self._toks) :]:
+            self._toks.append(litellm.token_counter(model=self._model, messages=[m]))
+        toks_total = sum(self._toks)
+        usd_total = usd_per_tok * toks_total
         return toks_total, usd_total
 
+    def to_snapshot(
+        self,
+        *,
+        tools: list[Tool],
+        all_tools: list[Tool],
+        tool_servers: dict[str, list[str]],
+        fingerprint: str,
+    ) -> snapshot.Snapshot:
+        self.get_costs()
+        return snapshot.Snapshot(
+            model=self._model,
+            fingerprint=fingerprint,
+            messages=list(self._msgs),
+            token_counts=list(self._toks),
+            tools=tools,
+            all_tools=all_tools,
+            tool_servers=tool_servers,
+        )
+
+    @classmethod
+    def from_snapshot(
+        cls,
+        snap: snapshot.Snapshot,
+        *,
+        model: str,
+        api_key: str,
+        cassette: cassette.Cassette | None = None,
+    ) -> "Conversation":
+        """Resume a conversation. Cached token counts are dropped if `model` differs from the snapshot's."""
+        conversation = cls(model=model, api_key=api_key, cassette=cassette)
+        conversation._msgs = list(snap.messages)
+        if model == snap.model:
+            conversation._toks = list(snap.token_counts)
+        return conversation
+
     # Private API
     def _push(self, msg: Message):
         self._msgs.append(msg)
@@ -0,0 +1,53 @@
+import collections
+import math
+import re
+
+import beartype
+
+_CAMEL_RE = re.compile(r"([a-z0-9])([A-Z])")
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+
+@beartype.beartype
+def tokenize(text: str) -> list[str]:
+    """Lowercase `text` and split it into alphanumeric words, breaking up snake_case and camelCase identifiers."""
+    return _TOKEN_RE.findall(_CAMEL_RE.sub(r"\1 \2", text).lower())
+
+
+@beartype.beartype
+class Bm25:
+    """Okapi BM25 index over a fixed list of tokenized documents."""
+
+    def __init__(self, docs: list[list[str]], *, k1: float = 1.5, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self._tfs = [collections.Counter(doc) for doc in docs]
+        self._lens = [len(doc) for doc in docs]
+        self._avg_len = sum(self._lens) / len(docs) if docs else 0.0
+
+        dfs = collections.Counter(term for tf in self._tfs for term in tf)
+        n = len(docs)
+        self._idf = {
+            term: math.log(1 + (n - df + 0.5) / (df + 0.5)) for term, df in dfs.items()
+        }
+
+    def __len__(self) -> int:
+        return len(self._tfs)
+
+    def scores(self, query: list[str]) -> list[float]:
+        terms = [t for t in set(query) if t in self._idf]
+        out = []
+        for tf, length in zip(self._tfs, self._lens):
+            norm = self.k1 * (1 - self.b + self.b * length / (self._avg_len or 1.0))
+            score = 0.0
+            for term in terms:
+                if f := tf.get(term):
+                    score += self._idf[term] * f * (self.k1 + 1) / (f + norm)
+            out.append(score)
+        return out
+
+
+@beartype.beartype
+def top_k(scores: list[float], k: int) -> list[int]:
+    """Indices of the `k` highest scores, best first; ties keep their original order."""
+    return sorted(range(len(scores)), key=lambda i: -scores[i])[:k]
@@ -0,0 +1,86 @@
+"""
+Snapshots of a finished conversation, so `shh --continue` can pick up where the last run left off without re-gathering context, re-listing tools or re-tokenizing earlier messages.
+"""
+
+import dataclasses
+import hashlib
+import json
+import os
+import pathlib
+
+import beartype
+import beartype.roar
+
+from . import unix
+
+
+@beartype.beartype
+@dataclasses.dataclass(frozen=True)
+class Snapshot:
+    """Final state of a conversation.
+
+    Attributes:
+        model: Model the conversation (and its token counts) used.
+        fingerprint: Identifies the terminal the conversation ran in; see `fingerprint()`.
+        messages: Every message sent to or received from the model, in order.
+        token_counts: Cached token count for each message in `messages`.
+        tools: Tool specs offered to the model at the end of the conversation.
+        all_tools: Every available tool spec.
+        tool_servers: Maps each prefixed tool name in `all_tools` to its [server name, original tool name].
+    """
+
+    model: str
+    fingerprint: str
+    messages: list[dict[str, object]]
+    token_counts: list[int]
+    tools: list[dict[str, object]]
+    all_tools: list[dict[str, object]]
+    tool_servers: dict[str, list[str]]
+
+
+@beartype.beartype
+def fingerprint() -> str:
+    """Hash of the current tmux server and pane, or of the tty outside tmux; empty if there is neither."""
+    if pane := os.getenv("TMUX_PANE", ""):
+        server = ",".join(os.getenv("TMUX", "").split(",")[:2])
+        key = f"tmux:{server}:{pane}"
+    elif os.isatty(0):
+        key = f"tty:{os.ttyname(0)}"
+    else:
+        return ""
+    return hashlib.sha1(key.encode()).hexdigest()
+
+
+@beartype.beartype
+def get_path(fingerprint: str) -> pathlib.Path:
+    """One file per terminal, so conversations in different panes don't overwrite each other."""
+    path = unix.get_state_dir() / "sessions" / f"{fingerprint or 'default'}.json"
+    path.parent.mkdir(parents=True, exist_ok=True)
+    return path
+
+
+@beartype.beartype
+def save(snap: Snapshot, path: pathlib.Path | None = None) -> None:
+    path = path or get_path(snap.fingerprint)
+    tmp = path.with_suffix(".tmp")
+    tmp.write_text(json.dumps(dataclasses.asdict(snap), default=str))
+    tmp.replace(path)
+
+
+@beartype.beartype
+def load(fingerprint: str, path: pathlib.Path | None = None) -> Snapshot | None:
+    """Return the last snapshot saved for `fingerprint`, or None if there isn't a readable one."""
+    path = path or get_path(fingerprint)
+    try:
+        data = json.loads(path.read_text())
+        if not isinstance(data, dict):
+            return None
+        snap = Snapshot(**data)
+    except (
+        FileNotFoundError,
+        json.JSONDecodeError,
+        TypeError,
+        beartype.roar.BeartypeCallHintViolation,
+    ):
+        return None
+    return snap if snap.fingerprint == fingerprint else None
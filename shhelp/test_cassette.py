@@ -0,0 +1,169 @@
+import asyncio
+import json
+
+import pytest
+
+from . import cassette
+
+
+def _identity(x):
+    return x
+
+
+def test_record_then_replay(tmp_path):
+    path = tmp_path / "session.jsonl"
+    calls = []
+
+    async def fake(resp):
+        calls.append(resp)
+        return resp
+
+    async def record():
+        cas = cassette.Cassette(path, replay=False)
+        a = await cas.call(
+            "completion",
+            "gpt",
+            lambda: fake({"text": "hi"}),
+            dump=_identity,
+            load=_identity,
+        )
+        b = await cas.call(
+            "call_tool",
+            "fs_read",
+            lambda: fake(["x"]),
+            dump=_identity,
+            load=_identity,
+            request={"path": "/"},
+        )
+        return a, b
+
+    async def replay():
+        cas = cassette.Cassette(path, replay=True)
+        # Kinds are served independently, in recorded order.
+        b = await cas.call(
+            "call_tool", "fs_read", lambda: fake(None), dump=_identity, load=_identity
+        )
+        a = await cas.call(
+            "completion", "gpt", lambda: fake(None), dump=_identity, load=_identity
+        )
+        return a, b
+
+    assert asyncio.run(record()) == ({"text": "hi"}, ["x"])
+    assert asyncio.run(replay()) == ({"text": "hi"}, ["x"])
+    assert calls == [{"text": "hi"}, ["x"]]
+
+
+def test_replay_mismatch_raises(tmp_path):
+    path = tmp_path / "session.jsonl"
+    path.write_text(
+        '{"kind": "call_tool", "key": "a", "elapsed": 0.0, "request": null, "response": 1}\n'
+    )
+    cas = cassette.Cassette(path, replay=True)
+
+    async def fake():
+        return 2
+
+    with pytest.raises(RuntimeError):
+        asyncio.run(cas.call("call_tool", "b", fake, dump=_identity, load=_identity))
+    with pytest.raises(RuntimeError):
+        asyncio.run(cas.call("completion", "m", fake, dump=_identity, load=_identity))
+
+
+def test_from_env(monkeypatch, tmp_path):
+    monkeypatch.delenv("SHHELP_RECORD", raising=False)
+    monkeypatch.delenv("SHHELP_REPLAY", raising=False)
+    assert cassette.from_env() is None
+
+    monkeypatch.setenv("SHHELP_RECORD", str(tmp_path / "rec.jsonl"))
+    cas = cassette.from_env()
+    assert cas is not None and not cas.replay
+
+
+# Importing litellm alone can take several seconds.
+@pytest.mark.timeout(60)
+def test_replay_agent_loop(monkeypatch, tmp_path):
+    """
+    Drive cli.cli through a full tool-calling turn from a cassette, with an MCP server that cannot start.
+    """
+    monkeypatch.setenv("LITELLM_LOCAL_MODEL_COST_MAP", "True")
+    import litellm
+    import mcp
+
+    from . import cli, config, llms, ui
+
+    tool_call = litellm.ModelResponse(
+        choices=[
+            {
+                "index": 0,
+                "finish_reason": "tool_calls",
+                "message": {
+                    "role": "assistant",
+                    "content": None,
+                    "tool_calls": [
+                        {
+                            "id": "call_1",
+                            "type": "function",
+                            "function": {
+                                "name": "fs_list",
+                                "arguments": json.dumps({"path": "."}),
+                            },
+                        }
+                    ],
+                },
+            }
+        ]
+    )
+    answer = litellm.ModelResponse(
+        choices=[
+            {
+                "index": 0,
+                "finish_reason": "stop",
+                "message": {"role": "assistant", "content": "Found README.md."},
+            }
+        ]
+    )
+    result = mcp.types.CallToolResult(
+        content=[mcp.types.TextContent(type="text", text="README.md")]
+    )
+    tools = [{"name": "fs_list", "description": "List files", "input_schema": {}}]
+    entries = [
+        ("list_tools", "", tools),
+        ("completion", "gpt-4.1-mini", tool_call.model_dump()),
+        ("call_tool", "fs_list", result.model_dump(mode="json")),
+        ("completion", "gpt-4.1-mini", answer.model_dump()),
+    ]
+    path = tmp_path / "session.jsonl"
+    path.write_text(
+        "".join(
+            json.dumps({
+                "kind": kind,
+                "key": key,
+                "elapsed": 0.0,
+                "request": None,
+                "response": resp,
+            })
+            + "\n"
+            for kind, key, resp in entries
+        )
+    )
+
+    monkeypatch.setenv("SHHELP_REPLAY", str(path))
+    monkeypatch.delenv("SHHELP_RECORD", raising=False)
+    monkeypatch.delenv("TMUX_PANE", raising=False)
+    monkeypatch.setenv("SHELL", "/bin/true")
+    monkeypatch.setenv("XDG_STATE_HOME", str(tmp_path / "state"))
+    monkeypatch.setattr(config, "_CFG_PATH", tmp_path / "config.toml")
+    monkeypatch.setattr(llms, "_LOG_BASE", tmp_path / "logs")
+
+    echoed = []
+    monkeypatch.setattr(ui, "confirm_next_request", lambda toks, usd: True)
+    monkeypatch.setattr(ui, "confirm", lambda markup: True)
+    monkeypatch.setattr(ui, "echo", echoed.append)
+    monkeypatch.setattr(ui, "echo_output", lambda text, **kwargs: echoed.append(text))
+
+    cfg = config.Config(
+        model="gpt-4.1-mini",
+        mcp_servers=[config.McpServer(name="fs", cmd="/nonexistent", args=[])],
+    )
+    assert asyncio.run(cli.cli(["what", "files", "are", "here?"], cfg=cfg)) == 0
+    assert echoed == ["README.md", "Found README.md."]
@@ -0,0 +1,40 @@
+import asyncio
+
+import pytest
+
+from . import cli
+
+
+class _FakeSession:
+    def __init__(self):
+        self.calls = []
+
+    async def call_tool(self, name, arguments):
+        self.calls.append((name, arguments))
+        return name
+
+
+def test_call_tool_restored_map_routes_by_server():
+    """
+    Server names that prefix each other ("git", "git_hub") must still route to the right session.
+    """
+    git, git_hub = _FakeSession(), _FakeSession()
+    manager = cli.McpServerManager()
+    manager.sessions = {"git": git, "git_hub": git_hub}
+    manager.tools_map = {
+        "git_hub_list_issues": ("git_hub", "list_issues"),
+        "git_log": ("git", "log"),
+    }
+
+    asyncio.run(manager.call_tool("git_hub_list_issues", {}))
+    asyncio.run(manager.call_tool("git_log", {"n": 1}))
+
+    assert git_hub.calls == [("list_issues", {})]
+    assert git.calls == [("log", {"n": 1})]
+
+
+def test_call_tool_unknown():
+    manager = cli.McpServerManager()
+    manager.sessions = {"git": _FakeSession()}
+    with pytest.raises(ValueError):
+        asyncio.run(manager.call_tool("git_log", {}))
@@ -0,0 +1,129 @@
+import os
+import pathlib
+import shutil
+import subprocess
+import time
+
+import pytest
+
+from . import hooks
+
+
+def _cmd(i: int, text: str = "ls") -> hooks.Command:
+    return hooks.Command(f"{text} {i}", "/tmp", i % 3, float(i), 0.25)
+
+
+def test_read_missing_ring(tmp_path):
+    assert hooks.read_recent(10, tmp_path / "commands.ring") == ()
+
+
+def test_record_roundtrip(tmp_path):
+    path = tmp_path / "commands.ring"
+    for i in range(5):
+        hooks.record(_cmd(i), path)
+
+    got = hooks.read_recent(3, path)
+    assert got == (_cmd(2), _cmd(3), _cmd(4))
+
+
+def test_ring_wraps(tmp_path):
+    path = tmp_path / "commands.ring"
+    for i in range(hooks._N_SLOTS + 10):
+        hooks.record(_cmd(i), path)
+
+    got = hooks.read_recent(hooks._N_SLOTS * 2, path)
+    assert len(got) == hooks._N_SLOTS
+    assert got[-1] == _cmd(hooks._N_SLOTS + 9)
+    assert got[0] == _cmd(10)
+
+
+def test_long_command_truncated(tmp_path):
+    path = tmp_path / "commands.ring"
+    hooks.record(_cmd(0, text="é" * 1000), path)
+    (got,) = hooks.read_recent(1, path)
+    assert got.cmd.startswith("ééé")
+    assert len(got.cmd.encode()) <= hooks._SLOT_SIZE
+
+
+@pytest.mark.parametrize("shell", hooks.SHELLS)
+def test_init_mentions_recorder(shell):
+    assert "-m shhelp.hooks record" in hooks.init(shell)
+
+
+def test_init_unknown_shell():
+    with pytest.raises(ValueError):
+        hooks.init("tcsh")
+
+
+# Shell setups the bash snippet has to coexist with.
+_BASH_PRELUDES = {
+    "prompt_command": "__other_hook() { :; }\nPROMPT_COMMAND=__other_hook\n",
+    # An existing DEBUG trap that logs what it sees, including $? and $_.
+    "debug_trap": (
+        'trap \'echo "$? $_ $BASH_COMMAND" >> "$DEBUG_LOG"\' DEBUG\n'
+        "echo warmup >/dev/null\n"
+    ),
+    # A minimal stand-in for bash-preexec: its own DEBUG trap and PROMPT_COMMAND call the hook arrays, passing $? to precmd functions.
+    "bash_preexec": (
+        "preexec_functions=(); precmd_functions=(); __bp_ready=0\n"
+        "__bp_debug() { [[ $__bp_ready == 1 ]] || return 0; __bp_ready=0;"
+        ' local f; for f in "${preexec_functions[@]}"; do "$f" "$BASH_COMMAND"; done; }\n'
+        "__bp_precmd() { local r=$? f;"
+        ' for f in "${precmd_functions[@]}"; do (exit $r); "$f"; done; __bp_ready=1; }\n'
+        "trap '__bp_debug' DEBUG\n"
+        "PROMPT_COMMAND=__bp_precmd\n"
+    ),
+}
+
+
+@pytest.mark.skipif(shutil.which("bash") is None, reason="needs bash")
+@pytest.mark.parametrize("prelude", sorted(_BASH_PRELUDES))
+def test_bash_hooks_record_commands(tmp_path, prelude):
+    """
+    Run the bash snippet in a real interactive shell after other hooks are installed, and check what lands in the ring buffer and that the other hooks still run.
+    """
+    rc = tmp_path / "rc.sh"
+    rc.write_text(
+        _BASH_PRELUDES[prelude] + "HISTCONTROL=ignorespace\n" + hooks.init("bash")
+    )
+    trap_file = tmp_path / "trap"
+    # Leading spaces keep the last two commands out of history, and so out of the ring.
+    script = (
+        "echo hi && false\ntrue | cat\n echo secret\nsleep 0.2\n"
+        f" trap -p DEBUG > {trap_file}\n exit\n"
+    )
+    env = {
+        **os.environ,
+        "XDG_STATE_HOME": str(tmp_path / "state"),
+        "HISTFILE": str(tmp_path / "history"),
+        "PYTHONPATH": str(pathlib.Path(__file__).parent.parent),
+        "DEBUG_LOG": str(tmp_path / "debug.log"),
+    }
+    subprocess.run(
+        ["bash", "--rcfile", str(rc), "-i"],
+        input=script,
+        text=True,
+        env=env,
+        capture_output=True,
+        check=True,
+    )
+
+    # The recorder runs in the background; wait for it.
+    path = tmp_path / "state" / "shhelp" / "commands.ring"
+    deadline = time.monotonic() + 8
+    while len(hooks.read_recent(10, path)) < 3 and time.monotonic() < deadline:
+        time.sleep(0.05)
+    time.sleep(0.2)
+
+    got = [(c.cmd, c.exit_code) for c in hooks.read_recent(10, path)]
+    assert got == [("echo hi && false", 1), ("true | cat", 0), ("sleep 0.2", 0)]
+    assert 0.2 <= hooks.read_recent(1, path)[0].duration < 1.0
+
+    trap = trap_file.read_text()
+    if prelude == "bash_preexec":
+        assert trap == "trap -- '__bp_debug' DEBUG\n"
+    if prelude == "debug_trap":
+        log = (tmp_path / "debug.log").read_text().splitlines()
+        # The user's trap still sees each command, with the previous $? and $_.
+        assert "1 false true" in log
+        assert any(line.endswith(" sleep 0.2") for line in log)
@@ -0,0 +1,35 @@
+from . import ranking
+
+
+def test_tokenize_identifiers():
+    assert ranking.tokenize("git_logGraph: Show HEAD") == [
+        "git",
+        "log",
+        "graph",
+        "show",
+        "head",
+    ]
+
+
+def test_bm25_prefers_matching_doc():
+    docs = [
+        ranking.tokenize("read_file: Read a file from disk"),
+        ranking.tokenize("git_log: Show the git commit log"),
+        ranking.tokenize("fetch: Download a URL"),
+    ]
+    index = ranking.Bm25(docs)
+    scores = index.scores(ranking.tokenize("why is my git log empty?"))
+    assert ranking.top_k(scores, 1) == [1]
+
+
+def test_bm25_unknown_terms_score_zero():
+    index = ranking.Bm25([["a"], ["b"]])
+    assert index.scores(["zzz"]) == [0.0, 0.0]
+
+
+def test_bm25_empty():
+    assert ranking.Bm25([]).scores(["a"]) == []
+
+
+def test_top_k_stable():
+    assert ranking.top_k([1.0, 3.0, 1.0, 3.0], 3) == [1, 3, 0]
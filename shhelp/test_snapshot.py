@@ -0,0 +1,73 @@
+import json
+
+from . import snapshot
+
+
+def _fields(**kwargs):
+    fields = dict(
+        model="gpt-4.1-mini",
+        fingerprint="abc",
+        messages=[
+            {"role": "system", "content": "be terse"},
+            {"role": "user", "content": "hi"},
+        ],
+        token_counts=[3, 1],
+        tools=[],
+        all_tools=[{"name": "fs_read", "description": "Read", "input_schema": {}}],
+        tool_servers={"fs_read": ["fs", "read"]},
+    )
+    fields.update(kwargs)
+    return fields
+
+
+def _snap(**kwargs):
+    return snapshot.Snapshot(**_fields(**kwargs))
+
+
+def test_roundtrip(tmp_path):
+    path = tmp_path / "session.json"
+    snapshot.save(_snap(), path)
+    assert snapshot.load("abc", path) == _snap()
+
+
+def test_load_missing(tmp_path):
+    assert snapshot.load("abc", tmp_path / "session.json") is None
+
+
+def test_load_malformed(tmp_path):
+    path = tmp_path / "session.json"
+    for text in ["{", "[]", '{"model": 1}', json.dumps({**_fields(), "model": 1})]:
+        path.write_text(text)
+        assert snapshot.load("abc", path) is None
+
+
+def test_sessions_per_terminal(monkeypatch, tmp_path):
+    monkeypatch.setenv("XDG_STATE_HOME", str(tmp_path))
+    snapshot.save(_snap(fingerprint="pane-a"))
+    snapshot.save(_snap(fingerprint="pane-b", model="other"))
+    assert snapshot.load("pane-a") == _snap(fingerprint="pane-a")
+    assert snapshot.load("pane-b").model == "other"
+    assert snapshot.load("pane-c") is None
+
+
+def test_fingerprint_no_terminal(monkeypatch):
+    monkeypatch.delenv("TMUX_PANE", raising=False)
+    monkeypatch.setattr(snapshot.os, "isatty", lambda fd: False)
+    assert snapshot.fingerprint() == ""
+
+
+def test_fingerprint_per_tty(monkeypatch):
+    monkeypatch.delenv("TMUX_PANE", raising=False)
+    monkeypatch.setattr(snapshot.os, "isatty", lambda fd: True)
+    monkeypatch.setattr(snapshot.os, "ttyname", lambda fd: "/dev/pts/1")
+    first = snapshot.fingerprint()
+    monkeypatch.setattr(snapshot.os, "ttyname", lambda fd: "/dev/pts/2")
+    assert first and snapshot.fingerprint() != first
+
+
+def test_fingerprint_per_pane(monkeypatch):
+    monkeypatch.setenv("TMUX", "/tmp/tmux-0/default,1,0")
+    monkeypatch.setenv("TMUX_PANE", "%1")
+    first = snapshot.fingerprint()
+    monkeypatch.setenv("TMUX_PANE", "%2")
+    assert snapshot.fingerprint() != first
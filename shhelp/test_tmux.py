@@ -0,0 +1,220 @@
+import shutil
+import subprocess
+
+import pytest
+
+from . import tmux
+
+
+def _cursor(history, history_size):
+    return tmux.Cursor(
+        history_size=history_size,
+        tail_hash=tmux._hash(history[-tmux._BOUNDARY_LINES :]),
+        history=history,
+    )
+
+
+def test_n_boundary_no_cursor():
+    assert tmux.n_boundary(None, 50, 2000) is None
+
+
+def test_n_boundary_history_shrank():
+    assert tmux.n_boundary(_cursor(["a"] * 10, 40), 20, 2000) is None
+
+
+def test_n_boundary_new_lines():
+    # 5 new lines plus 3 boundary lines.
+    assert tmux.n_boundary(_cursor(["a", "b", "c", "d"], 10), 15, 2000) == 8
+
+
+def test_n_boundary_at_history_limit():
+    # tmux trims history_limit / 10 lines at a time, so anything in that band counts as full.
+    cursor = _cursor(["a", "b", "c", "d"], 1900)
+    assert tmux.n_boundary(cursor, 1900, 2000) is None
+    assert tmux.n_boundary(cursor, 2000, 2000) is None
+    assert tmux.n_boundary(cursor, 1899, 2000) is None  # shrank
+    assert tmux.n_boundary(_cursor(["a"], 1700), 1799, 2000) == 100
+
+
+def test_extend_history_appends():
+    cursor = _cursor(["1", "2", "3", "4"], 4)
+    got = tmux.extend_history(cursor, ["2", "3", "4", "5", "6"], 100)
+    assert got == ["1", "2", "3", "4", "5", "6"]
+
+
+def test_extend_history_keeps_last_n():
+    cursor = _cursor(["1", "2", "3", "4"], 4)
+    assert tmux.extend_history(cursor, ["2", "3", "4", "5"], 3) == ["3", "4", "5"]
+
+
+def test_align_history_finds_cache_end():
+    cursor = _cursor(["a", "b", "c", "d", "e"], 2000)
+    got = tmux.align_history(
+        cursor, ["c", "d", "e", "f", "g"], 100, partial_first=False
+    )
+    assert got == ["a", "b", "c", "d", "e", "f", "g"]
+
+
+def test_align_history_repeated_lines():
+    # The latest full match wins, so new output after a run of repeated lines is kept.
+    cursor = _cursor(["x"] * 10, 2000)
+    captured = ["x"] * 6 + ["MARKER"] + ["x"] * 4
+    got = tmux.align_history(cursor, captured, 100, partial_first=False)
+    assert got == ["x"] * 10 + ["MARKER"] + ["x"] * 4
+
+
+def test_align_history_partial_first_line():
+    cursor = _cursor(["a", "long line", "b", "c", "d"], 2000)
+    captured = ["line", "b", "c", "d", "e"]
+    assert tmux.align_history(cursor, captured, 100, partial_first=False) is None
+    got = tmux.align_history(cursor, captured, 100, partial_first=True)
+    assert got == ["a", "long line", "b", "c", "d", "e"]
+
+
+def test_align_history_no_overlap():
+    cursor = _cursor(["a", "b", "c"], 2000)
+    assert tmux.align_history(cursor, ["x", "y", "z"], 100, partial_first=False) is None
+
+
+def test_extend_history_zero_lines():
+    cursor = _cursor(["1", "2", "3", "4"], 4)
+    assert tmux.extend_history(cursor, ["2", "3", "4", "5"], 0) == []
+
+
+def test_extend_history_mismatch():
+    cursor = _cursor(["1", "2", "3", "4"], 4)
+    assert tmux.extend_history(cursor, ["x", "y", "z", "5"], 100) is None
+
+
+def test_extend_history_empty_cursor():
+    cursor = _cursor([], 0)
+    assert tmux.extend_history(cursor, ["1", "2"], 100) == ["1", "2"]
+
+
+def _pane(pane_id, history, activity=0.0, cwd="/"):
+    return tmux.Pane(
+        id=pane_id, cwd=cwd, active=False, history=history, activity=activity
+    )
+
+
+def test_score_panes_lexical():
+    panes = [_pane("%1", "ls\nREADME.md"), _pane("%2", "cargo build\nCompiling foo")]
+    scores = tmux.score_panes("cargo build is slow", panes, now=0.0)
+    assert scores[1] > scores[0]
+
+
+def test_score_panes_errors():
+    panes = [_pane("%1", "make\nok"), _pane("%2", "make\nmake: *** Error 1")]
+    scores = tmux.score_panes("help", panes, now=0.0)
+    assert scores[1] > scores[0]
+
+
+def test_score_panes_recency():
+    panes = [_pane("%1", "x", activity=0.0), _pane("%2", "x", activity=3600.0)]
+    scores = tmux.score_panes("help", panes, now=3600.0)
+    assert scores[1] > scores[0]
+
+
+def test_top_panes():
+    panes = [
+        _pane("%1", "vim notes.md"),
+        _pane("%2", "pytest\nFAILED test_api.py::test_login"),
+        _pane("%3", "htop"),
+    ]
+    got = tmux.top_panes("why is test_login failing", panes, 1)
+    assert [p.id for p in got] == ["%2"]
+
+
+class _Server:
+    """A throwaway tmux server with one bash pane, which `tmux.get_panes` sees as the current pane."""
+
+    def __init__(self, tmp_path, history_limit: int):
+        self.sock = str(tmp_path / "tmux.sock")
+        conf = tmp_path / "tmux.conf"
+        conf.write_text(f"set -g history-limit {history_limit}\n")
+        self("-f", str(conf), "new-session", "-d", "-x", "80", "-y", "5")
+        self("respawn-pane", "-k", "bash --norc --noprofile")
+        self.pane = self("display-message", "-p", "#{pane_id}").strip()
+        self.pid = self("display-message", "-p", "#{pid}").strip()
+
+    def __call__(self, *args):
+        return subprocess.check_output(["tmux", "-S", self.sock, *args], text=True)
+
+    def run(self, cmd, channel):
+        # The pane signals a tmux channel when done, so no sentinel line is printed.
+        self(
+            "send-keys", "-t", self.pane, f"{cmd}; tmux wait-for -S {channel}", "Enter"
+        )
+        self("wait-for", channel)
+
+
+@pytest.fixture
+def server(monkeypatch, tmp_path, request):
+    if shutil.which("tmux") is None:
+        pytest.skip("needs tmux")
+    srv = _Server(tmp_path, request.param)
+    monkeypatch.setenv("TMUX", f"{srv.sock},{srv.pid},0")
+    monkeypatch.setenv("TMUX_PANE", srv.pane)
+    monkeypatch.setenv("XDG_STATE_HOME", str(tmp_path / "state"))
+    yield srv
+    srv("kill-server")
+
+
+@pytest.mark.parametrize("server", [20], indirect=True)
+def test_get_panes_at_history_limit(server):
+    """
+    Once a pane hits history-limit its history_size stops growing; new output must still show up.
+    """
+    # Both runs end in identical lines, so the boundary hash alone would match.
+    server.run("for i in $(seq 40); do echo x; done", "first")
+    tmux.get_panes(100)
+
+    server.run("echo MARKER; for i in $(seq 12); do echo x; done", "second")
+    assert "\nMARKER\n" in server("capture-pane", "-p", "-S", "-", "-t", server.pane)
+    active, _ = tmux.get_panes(100)
+    assert "\nMARKER\n" in active.history
+
+
+@pytest.mark.parametrize("server", [500], indirect=True)
+def test_get_panes_incremental_at_history_limit(server, monkeypatch):
+    """
+    At the history limit, a run after a little new output only captures a small window.
+    """
+    server.run("for i in $(seq 700); do echo line $i; done", "first")
+    tmux.get_panes(400)
+
+    server.run("for i in $(seq 5); do echo more $i; done", "second")
+    windows = []
+    capture = tmux._capture
+    monkeypatch.setattr(
+        tmux,
+        "_capture",
+        lambda pane, start: windows.append(start) or capture(pane, start),
+    )
+    active, _ = tmux.get_panes(400)
+    assert windows == [tmux._SEARCH_LINES]
+
+    history_size = int(server("display-message", "-p", "#{history_size}"))
+    history, visible = capture(server.pane, min(400, history_size))
+    assert active.history == "\n".join(history + visible).strip()
+
+
+def test_load_cursors_malformed(monkeypatch, tmp_path):
+    monkeypatch.setenv("XDG_STATE_HOME", str(tmp_path))
+    path = tmux._cursors_path()
+    for text in [
+        "[]",
+        "{",
+        '{"s:%1": []}',
+        '{"s:%1": {"history_size": "1", "tail_hash": "", "history": []}}',
+    ]:
+        path.write_text(text)
+        assert tmux._load_cursors() == {}
+
+
+def test_save_cursors_roundtrip(monkeypatch, tmp_path):
+    monkeypatch.setenv("XDG_STATE_HOME", str(tmp_path))
+    cursors = {"s:%1": _cursor(["a", "b"], 2)}
+    tmux._save_cursors(cursors)
+    assert tmux._load_cursors() == cursors
+    assert [p.name for p in tmux._cursors_path().parent.iterdir()] == ["panes.json"]
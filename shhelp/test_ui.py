@@ -0,0 +1,60 @@
+import io
+import os
+import time
+
+import pytest
+import rich.console
+
+from . import ui
+
+
+def test_truncate_short_passthrough():
+    lines = ["a", "b", "c"]
+    assert ui.truncate(lines, head=2, tail=2) == lines
+
+
+def test_truncate_keeps_head_and_tail():
+    lines = [str(i) for i in range(100)]
+    out = ui.truncate(lines, head=3, tail=2)
+    assert out == ["0", "1", "2", "... 95 lines omitted ...", "98", "99"]
+
+
+def test_truncate_zero_tail():
+    lines = [str(i) for i in range(10)]
+    assert ui.truncate(lines, head=1, tail=0) == ["0", "... 9 lines omitted ..."]
+
+
+def test_echo_output_is_not_markdown(monkeypatch):
+    buf = io.StringIO()
+    monkeypatch.setattr(ui, "_CONSOLE", rich.console.Console(file=buf))
+    ui.echo_output("/tmp/__init__.py\n**/*.py\n# not a heading")
+    assert buf.getvalue() == "/tmp/__init__.py\n**/*.py\n# not a heading\n"
+
+
+def _100k_lines() -> str:
+    return "\n".join(f"src/pkg_{i}/mod_{i}.py:{i}: *match*" for i in range(100_000))
+
+
+def test_echo_output_100k_lines(monkeypatch):
+    buf = io.StringIO()
+    monkeypatch.setattr(ui, "_CONSOLE", rich.console.Console(file=buf))
+    text = _100k_lines()
+
+    ui.echo_output(text, lines=100_000)
+
+    assert buf.getvalue() == text + "\n"
+
+
+@pytest.mark.skipif(not os.getenv("SHHELP_BENCH"), reason="set SHHELP_BENCH=1")
+def test_echo_output_100k_lines_bench(monkeypatch):
+    """
+    Report how long rendering 100k lines of tool output takes. Run with `just bench`.
+    """
+    monkeypatch.setattr(ui, "_CONSOLE", rich.console.Console(file=io.StringIO()))
+    text = _100k_lines()
+
+    start = time.perf_counter()
+    ui.echo_output(text, lines=100_000)
+    elapsed = time.perf_counter() - start
+
+    print(f"echo_output: 100k lines in {elapsed * 1000:.1f} ms")
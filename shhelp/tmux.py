@@ -1,8 +1,19 @@
+import concurrent.futures
 import dataclasses
+import hashlib
+import json
+import math
 import os
+import pathlib
+import re
 import subprocess
+import time
+import uuid
 
 import beartype
+import beartype.roar
+
+from . import hooks, ranking, unix
 
 
 @beartype.beartype
@@ -18,49 +29,361 @@ class Pane:
         cwd: The current working directory of the pane.
         active: Whether the pane is currently active.
         history: All lines of history in the pane.
+        window: The pane's `session:window` target.
+        activity: Unix timestamp of the last activity in the pane's window.
     """
 
     id: str
     cwd: str
     active: bool
     history: str
+    window: str = ""
+    activity: float = 0.0
+
+
+# Number of trailing history lines hashed to check that cached history still lines up with the pane.
+_BOUNDARY_LINES = 3
+# Lines first searched for the end of the cached history once a pane is at its history limit; the window grows 4x up to `history_lines` if needed.
+_SEARCH_LINES = 64
 
 
 @beartype.beartype
-def get_panes() -> tuple[Pane, list[Pane]]:
-    active_pane, other_panes = None, []
+@dataclasses.dataclass(frozen=True)
+class Cursor:
+    """What an earlier run captured from a pane, so later runs only capture new lines.
+
+    Attributes:
+        history_size: tmux's `history_size` for the pane at capture time.
+        tail_hash: Hash of the last `_BOUNDARY_LINES` lines of `history`.
+        history: Captured scrollback lines (not including the visible screen).
+    """
+
+    history_size: int
+    tail_hash: str
+    history: list[str]
+
+
+@beartype.beartype
+def _hash(lines: list[str]) -> str:
+    return hashlib.sha1("\n".join(lines).encode()).hexdigest()
+
+
+@beartype.beartype
+def _cursors_path() -> pathlib.Path:
+    return unix.get_state_dir() / "panes.json"
+
+
+@beartype.beartype
+def _load_cursors() -> dict[str, Cursor]:
+    try:
+        data = json.loads(_cursors_path().read_text())
+        if not isinstance(data, dict):
+            return {}
+        return {key: Cursor(**value) for key, value in data.items()}
+    except (
+        FileNotFoundError,
+        json.JSONDecodeError,
+        TypeError,
+        beartype.roar.BeartypeCallHintViolation,
+    ):
+        return {}
+
+
+@beartype.beartype
+def _save_cursors(cursors: dict[str, Cursor]) -> None:
+    data = {key: dataclasses.asdict(cursor) for key, cursor in cursors.items()}
+    # Concurrent shh runs each write their own temp file; the last replace wins.
+    path = _cursors_path()
+    tmp = path.with_suffix(f".{os.getpid()}.tmp")
+    tmp.write_text(json.dumps(data))
+    tmp.replace(path)
+
+
+@beartype.beartype
+def extend_history(
+    cursor: Cursor, captured: list[str], n_lines: int
+) -> list[str] | None:
+    """Append newly captured lines to a cursor's cached history.
+
+    Args:
+        cursor: State from the previous capture.
+        captured: History lines captured starting `n_boundary(cursor, ...)` lines back.
+        n_lines: Maximum lines of history to keep.
+
+    Returns:
+        The last `n_lines` lines of history, or None if `captured` does not start with the cursor's last lines (the pane was cleared, its history limit was reached, or the pane id was reused).
+    """
+    k = min(_BOUNDARY_LINES, len(cursor.history))
+    if _hash(captured[:k]) != cursor.tail_hash:
+        return None
+    if n_lines <= 0:
+        return []
+    return (cursor.history + captured[k:])[-n_lines:]
+
+
+@beartype.beartype
+def align_history(
+    cursor: Cursor, captured: list[str], n_lines: int, *, partial_first: bool
+) -> list[str] | None:
+    """Find where a cursor's cached history ends inside `captured` and append the lines after it.
+
+    Used once a pane is at its history limit, where `history_size` no longer says how many lines are new. The end of the cached history is taken as the latest position in `captured` whose preceding lines match the cache's last lines (at least `_BOUNDARY_LINES` of them, and as many as both have).
+
+    Args:
+        cursor: State from the previous capture.
+        captured: The most recent history lines.
+        n_lines: Maximum lines of history to keep.
+        partial_first: Whether the capture started mid-history, so `captured[0]` may be the tail of a wrapped line and is ignored.
+
+    Returns:
+        The last `n_lines` lines of history, or None if the cached history does not end inside `captured` (more new lines than captured, or the pane was cleared).
+    """
+    window = captured[1:] if partial_first else captured
+    old = cursor.history
+    k = min(_BOUNDARY_LINES, len(old))
+    if k == 0:
+        return None
+    for end in range(len(window), k - 1, -1):
+        if window[end - k : end] != old[-k:]:
+            continue
+        overlap = min(end, len(old))
+        if window[end - overlap : end] == old[-overlap:]:
+            if n_lines <= 0:
+                return []
+            return (old + window[end:])[-n_lines:]
+    return None
+
+
+@beartype.beartype
+def _at_history_limit(history_size: int, history_limit: int) -> bool:
+    # tmux drops the oldest lines in chunks of history_limit / 10 once a pane gets that close to its limit, so history_size stops counting new lines.
+    return history_size + max(history_limit // 10, 1) >= history_limit
+
+
+@beartype.beartype
+def n_boundary(
+    cursor: Cursor | None, history_size: int, history_limit: int
+) -> int | None:
+    """How many lines back to start an incremental capture, or None if a full capture is needed."""
+    if cursor is None or cursor.history_size > history_size:
+        return None
+    # Near the limit, only the boundary hash would notice new lines, and repeated lines fool it; `align_history` handles that case.
+    if _at_history_limit(history_size, history_limit):
+        return None
+    start = (
+        history_size - cursor.history_size + min(_BOUNDARY_LINES, len(cursor.history))
+    )
+    if start > history_size:
+        return None
+    return start
+
+
+@beartype.beartype
+def _capture(pane_id: str, start: int) -> tuple[list[str], list[str]]:
+    """Capture the `start` most recent history lines and the visible screen with one tmux call."""
+    marker = f"shhelp-{uuid.uuid4().hex}"
+    cmd = ["tmux"]
+    if start > 0:
+        cmd += [
+            "capture-pane",
+            "-p",  # print to stdout
+            "-J",  # join wrapped lines
+            "-S",
+            str(-start),
+            "-E",
+            "-1",  # stop at the last history line
+            "-t",  # target this pane
+            pane_id,
+            ";",
+        ]
+    cmd += [
+        "display-message",
+        "-p",
+        marker,
+        ";",
+        "capture-pane",
+        "-p",
+        "-J",
+        "-t",
+        pane_id,
+    ]
+    lines = subprocess.check_output(cmd, text=True).splitlines()
+    i = lines.index(marker)
+    return lines[:i], lines[i + 1 :]
+
+
+@beartype.beartype
+def _capture_pane(
+    pane_id: str,
+    history_size: int,
+    history_limit: int,
+    cursor: Cursor | None,
+    history_lines: int,
+) -> tuple[list[str], list[str]]:
+    """Return a pane's history (up to `history_lines`) and visible screen."""
+    # Only capture lines added since the last run when the cached history still lines up.
+    start = n_boundary(cursor, history_size, history_limit)
+    if start is not None:
+        captured, visible = _capture(pane_id, start)
+        history = extend_history(cursor, captured, history_lines)
+        if history is not None:
+            return history, visible
+
+    limit = max(min(history_lines, history_size), 0)
+    if cursor is not None and _at_history_limit(history_size, history_limit):
+        # Search a small window of recent history for where the cache ends, widening it only if there is more new output than fits.
+        window = min(_SEARCH_LINES, limit)
+        while True:
+            captured, visible = _capture(pane_id, window)
+            history = align_history(
+                cursor, captured, history_lines, partial_first=window < history_size
+            )
+            if history is not None:
+                return history, visible
+            if window >= limit:
+                # That was a full capture already.
+                return captured, visible
+            window = min(window * 4, limit)
+
+    return _capture(pane_id, limit)
+
+
+@beartype.beartype
+def get_panes(
+    history_lines: int = 100, all_panes: bool = False
+) -> tuple[Pane, list[Pane]]:
+    """Capture the active pane and the other panes in its window (or in every session if `all_panes`)."""
     active_id = os.getenv("TMUX_PANE")
-    fmt = "#{pane_id},#{pane_current_path}"
+    if not active_id:
+        # Not inside tmux; there is no scrollback to capture.
+        return Pane(id="", cwd=os.getcwd(), active=True, history=""), []
+
+    # Pane ids are only unique within a tmux server.
+    server = ",".join(os.getenv("TMUX", "").split(",")[:2])
+    # Keep only this server's cursors so the file does not grow without bound.
+    cursors = {
+        key: cursor
+        for key, cursor in _load_cursors().items()
+        if key.startswith(f"{server}:")
+    }
+
+    # Tab-separated because session names and paths may contain commas.
+    fmt = "\t".join([
+        "#{pane_id}",
+        "#{history_size}",
+        "#{history_limit}",
+        "#{window_activity}",
+        "#{session_name}:#{window_index}",
+        "#{pane_current_path}",
+    ])
     cmd = [
         "tmux",
         "list-panes",
         "-F",  # custom format
         fmt,
     ]
-    for line in subprocess.check_output(cmd, text=True).splitlines():
-        pane_id, cwd = line.split(",", 2)
+    if all_panes:
+        cmd.append("-a")  # every pane on the server
 
-        hist_cmd = [
-            "tmux",
-            "capture-pane",
-            "-p",  # print to stdout
-            "-J",  # join wrapped lines
-            "-S",
-            "-100",  # start 100 lines from bottom
-            "-t",  # target this pane
+    rows = []
+    for line in subprocess.check_output(cmd, text=True).splitlines():
+        pane_id, history_size, history_limit, activity, window, cwd = line.split(
+            "\t", 5
+        )
+        rows.append((
             pane_id,
+            int(history_size),
+            int(history_limit),
+            float(activity),
+            window,
+            cwd,
+        ))
+
+    # Each capture is its own tmux call, so run them concurrently.
+    with concurrent.futures.ThreadPoolExecutor(max_workers=8) as pool:
+        futures = [
+            pool.submit(
+                _capture_pane,
+                pane_id,
+                history_size,
+                history_limit,
+                cursors.get(f"{server}:{pane_id}"),
+                history_lines,
+            )
+            for pane_id, history_size, history_limit, *_ in rows
         ]
-        history = subprocess.check_output(hist_cmd, text=True).strip()
+        captures = [future.result() for future in futures]
 
-        pane = Pane(id=pane_id, cwd=cwd, active=pane_id == active_id, history=history)
+    active_pane, other_panes = None, []
+    for (pane_id, history_size, _, activity, window, cwd), (history, visible) in zip(
+        rows, captures
+    ):
+        cursors[f"{server}:{pane_id}"] = Cursor(
+            history_size=history_size,
+            tail_hash=_hash(history[-_BOUNDARY_LINES:]),
+            history=history,
+        )
+
+        text = "\n".join(history + visible).strip()
+        pane = Pane(
+            id=pane_id,
+            cwd=cwd,
+            active=pane_id == active_id,
+            history=text,
+            window=window,
+            activity=activity,
+        )
         if pane.active:
             active_pane = pane
         else:
             other_panes.append(pane)
 
+    _save_cursors(cursors)
     return active_pane, other_panes
 
 
+_ERROR_RE = re.compile(
+    r"\b(error|errors|failed|failure|fatal|panic|traceback|exception|segmentation fault|command not found|no such file|permission denied)\b",
+    re.IGNORECASE,
+)
+# Only the end of a pane is checked for errors; older failures are likely resolved.
+_ERROR_TAIL_LINES = 50
+# Seconds for a pane's recency score to halve.
+_RECENCY_HALF_LIFE_S = 600.0
+
+
+@beartype.beartype
+def score_panes(
+    query: str, panes: list[Pane], *, now: float | None = None
+) -> list[float]:
+    """Score how relevant each pane is to `query`.
+
+    The score sums three parts, each in [0, 1]: BM25 overlap between the query and the pane's history and cwd (relative to the best pane), how many error-looking lines the end of the pane has, and how recently its window was active.
+    """
+    now = time.time() if now is None else now
+    index = ranking.Bm25([
+        ranking.tokenize(f"{pane.cwd}\n{pane.history}") for pane in panes
+    ])
+    lexical = index.scores(ranking.tokenize(query))
+    best = max(lexical, default=0.0) or 1.0
+
+    scores = []
+    for pane, lex in zip(panes, lexical):
+        tail = "\n".join(pane.history.splitlines()[-_ERROR_TAIL_LINES:])
+        errors = min(len(_ERROR_RE.findall(tail)), 5) / 5
+        age = max(now - pane.activity, 0.0)
+        recency = math.pow(0.5, age / _RECENCY_HALF_LIFE_S)
+        scores.append(lex / best + errors + recency)
+    return scores
+
+
+@beartype.beartype
+def top_panes(query: str, panes: list[Pane], k: int) -> list[Pane]:
+    """The `k` panes most relevant to `query`, best first."""
+    scores = score_panes(query, panes)
+    return [panes[i] for i in ranking.top_k(scores, k)]
+
+
 @beartype.beartype
 @dataclasses.dataclass(frozen=True)
 class Context:
@@ -69,11 +392,19 @@ class Context:
     system: str
     shell: str
     aliases: tuple[str, ...]
+    commands: tuple[hooks.Command, ...]
 
-    def __init__(self, shell: str | None = None):
+    def __init__(
+        self,
+        shell: str | None = None,
+        n_commands: int = 20,
+        history_lines: int = 100,
+        all_panes: bool = False,
+    ):
         import subprocess
 
-        active, panes = get_panes()
+        active, panes = get_panes(history_lines, all_panes)
+        commands = hooks.read_recent(n_commands)
         system = subprocess.check_output(["uname", "-a"], text=True).strip()
         shell = shell or os.getenv("SHELL", "")
 
@@ -96,3 +427,4 @@ class Context:
         object.__setattr__(self, "system", system)
         object.__setattr__(self, "shell", shell)
         object.__setattr__(self, "aliases", aliases)
+        object.__setattr__(self, "commands", commands)
@@ -1,3 +1,5 @@
+import time
+
 import beartype
 import rich.console
 import rich.markdown
@@ -14,6 +16,9 @@ _THEME = rich.theme.Theme({
 
 _CONSOLE = rich.console.Console(theme=_THEME)
 
+# Minimum seconds between terminal flushes when writing bulk output.
+_FLUSH_INTERVAL_S = 1 / 30
+
 ###########
 # Generic #
 ###########
@@ -25,6 +30,49 @@ def echo(md: str) -> None:
     _CONSOLE.print(rich.markdown.Markdown(md))
 
 
+@beartype.beartype
+def truncate(lines: list[str], *, head: int, tail: int) -> list[str]:
+    """Keep the first `head` and last `tail` lines, replacing the middle with a marker line."""
+    if len(lines) <= head + tail + 1:
+        return lines
+    omitted = len(lines) - head - tail
+    return [
+        *lines[:head],
+        f"... {omitted} lines omitted ...",
+        *(lines[-tail:] if tail else []),
+    ]
+
+
+@beartype.beartype
+def echo_output(text: str, *, lines: int = 40, pager: bool = False) -> None:
+    """Write raw tool output to the console as plain text.
+
+    Unlike `echo`, this never parses markdown, which is slow on large outputs and mangles paths containing `_` or `*`. Output is truncated to the first and last `lines` lines unless `pager` is set, in which case the full text goes to the system pager.
+    """
+    if pager:
+        with _CONSOLE.pager():
+            _CONSOLE.out(text, highlight=False)
+        return
+
+    kept = truncate(text.splitlines(), head=lines, tail=lines)
+
+    # Batch lines and flush at a bounded rate rather than once per line.
+    fd = _CONSOLE.file
+    buf = []
+    last = time.monotonic()
+    for line in kept:
+        buf.append(line)
+        now = time.monotonic()
+        if now - last >= _FLUSH_INTERVAL_S:
+            fd.write("\n".join(buf) + "\n")
+            fd.flush()
+            buf.clear()
+            last = now
+    if buf:
+        fd.write("\n".join(buf) + "\n")
+    fd.flush()
+
+
 @beartype.beartype
 def confirm(markup: str, *, default_yes: bool = True) -> bool:
     """Prompt the user for a yes/no answer, returning True if yes."""
@@ -5,8 +5,13 @@ import beartype
 
 
 @beartype.beartype
-def get_history_path() -> pathlib.Path:
+def get_state_dir() -> pathlib.Path:
     base = pathlib.Path(os.getenv("XDG_STATE_HOME", "~/.local/state")).expanduser()
-    path = base / "shhelp" / "history"
-    path.parent.mkdir(parents=True, exist_ok=True)
+    path = base / "shhelp"
+    path.mkdir(parents=True, exist_ok=True)
     return path
+
+
+@beartype.beartype
+def get_history_path() -> pathlib.Path:
+    return get_state_dir() / "history"